@@ -24,6 +24,7 @@ import traceback
 from typing import Any, Dict, List, Optional, Union
 
 import h5py
+import joblib
 import numpy as np
 import pandas as pd
 import scipy.sparse
@@ -193,8 +194,51 @@ def fold_schema(X, y, cv=1, is_classifier=True):
     return result
 
 
+def fold_log_loss(trained, X_test, y_test) -> Optional[float]:
+    """Log loss of a trained estimator on the test part of a fold, or None if
+    it cannot be computed."""
+    # not all estimators have predict probability
+    try:
+        y_pred_proba = trained.predict_proba(X_test)
+        return log_loss(y_true=y_test, y_pred=y_pred_proba)
+    except BaseException:
+        logger.debug("Warning, log loss cannot be computed")
+        return None
+
+
+def mean_fold_results(fold_results):
+    """Mean score, log loss, and time of a list of (score, log loss or None,
+    time) per fold. The mean log loss is nan if no fold has one."""
+    cv_results: List[float] = [score for score, _, _ in fold_results]
+    log_loss_results = [ll for _, ll, _ in fold_results if ll is not None]
+    time_results = [t for _, _, t in fold_results]
+    if log_loss_results:
+        mean_log_loss = np.array(log_loss_results).mean()
+    else:
+        mean_log_loss = np.nan
+    return (
+        np.array(cv_results).mean(),
+        mean_log_loss,
+        np.array(time_results).mean(),
+    )
+
+
+def _fit_and_score_fold(estimator, scorer, X_train, y_train, X_test, y_test, args):
+    start = time.time()
+    # Not calling sklearn.base.clone() here, because:
+    #  (1) For Lale pipelines, clone() calls the pipeline constructor
+    #      with edges=None, so the resulting topology is incorrect.
+    #  (2) For Lale individual operators, the fit() method already
+    #      clones the impl object, so cloning again is redundant.
+    trained = estimator.fit(X_train, y_train)
+    score_value = scorer(trained, X_test, y_test, **args)
+    execution_time = time.time() - start
+    logloss = fold_log_loss(trained, X_test, y_test)
+    return score_value, logloss, execution_time
+
+
 def cross_val_score_track_trials(
-    estimator, X, y=None, scoring=accuracy_score, cv=5, args_to_scorer=None
+    estimator, X, y=None, scoring=accuracy_score, cv=5, args_to_scorer=None, n_jobs=1
 ):
     """
     Use the given estimator to perform fit and predict for splits defined by 'cv' and compute the given score on
@@ -217,6 +261,8 @@ def cross_val_score_track_trials(
         Note that any of the iterators from https://scikit-learn.org/stable/modules/cross_validation.html#cross-validation-iterators can be used here.
     args_to_scorer: A dictionary of additional keyword arguments to pass to the scorer.
                 Used for cases where the scorer has a signature such as ``scorer(estimator, X, y, **kwargs)``.
+    n_jobs: Number of folds to fit in parallel with joblib, default is 1.
+        If -1, use all processors.
     Returns
     -------
         cv_results: a list of scores corresponding to each cross validation fold
@@ -227,36 +273,24 @@ def cross_val_score_track_trials(
     if args_to_scorer is None:
         args_to_scorer = {}
     scorer = check_scoring(estimator, scoring=scoring)
-    cv_results: List[float] = []
-    log_loss_results = []
-    time_results = []
-    for train, test in cv.split(X, y):
+
+    def make_fold_args(train, test):
         X_train, y_train = split_with_schemas(estimator, X, y, train)
         X_test, y_test = split_with_schemas(estimator, X, y, test, train)
-        start = time.time()
-        # Not calling sklearn.base.clone() here, because:
-        #  (1) For Lale pipelines, clone() calls the pipeline constructor
-        #      with edges=None, so the resulting topology is incorrect.
-        #  (2) For Lale individual operators, the fit() method already
-        #      clones the impl object, so cloning again is redundant.
-        trained = estimator.fit(X_train, y_train)
-        score_value = scorer(trained, X_test, y_test, **args_to_scorer)
-        execution_time = time.time() - start
-        # not all estimators have predict probability
-        try:
-            y_pred_proba = trained.predict_proba(X_test)
-            logloss = log_loss(y_true=y_test, y_pred=y_pred_proba)
-            log_loss_results.append(logloss)
-        except BaseException:
-            logger.debug("Warning, log loss cannot be computed")
-        cv_results.append(score_value)
-        time_results.append(execution_time)
-    result = (
-        np.array(cv_results).mean(),
-        np.array(log_loss_results).mean(),
-        np.array(execution_time).mean(),
-    )
-    return result
+        return (estimator, scorer, X_train, y_train, X_test, y_test, args_to_scorer)
+
+    if n_jobs == 1:
+        fold_results = [
+            _fit_and_score_fold(*make_fold_args(train, test))
+            for train, test in cv.split(X, y)
+        ]
+    else:
+        parallel = joblib.Parallel(n_jobs=n_jobs, backend="loky", prefer="processes")
+        fold_results = parallel(
+            joblib.delayed(_fit_and_score_fold)(*make_fold_args(train, test))
+            for train, test in cv.split(X, y)
+        )
+    return mean_fold_results(fold_results)
 
 
 def cross_val_score(estimator, X, y=None, scoring=accuracy_score, cv=5):
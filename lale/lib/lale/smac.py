@@ -12,19 +12,35 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import hashlib
+import importlib.util
+import json
 import logging
+import math
+import os
+import shutil
+import tempfile
 import time
 import traceback
+from typing import Any
 
+import joblib
 import numpy as np
+from sklearn.exceptions import NotFittedError
 from sklearn.metrics import check_scoring, log_loss
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import (
+    ShuffleSplit,
+    StratifiedShuffleSplit,
+    train_test_split,
+)
 from sklearn.model_selection._split import check_cv
 
+import lale.datasets.data_schemas
 import lale.docstrings
+import lale.helpers
 import lale.operators
 import lale.sklearn_compat
-from lale.helpers import cross_val_score_track_trials
 from lale.lib.sklearn import LogisticRegression
 
 try:
@@ -34,20 +50,372 @@ try:
     # Import SMAC-utilities
     from smac.facade.smac_facade import SMAC as orig_SMAC
     from smac.scenario.scenario import Scenario
+    from smac.tae.execute_func import ExecuteTAFuncDict
     from smac.tae.execute_ta_run import BudgetExhaustedException
 
-    from lale.search.lale_smac import (
-        get_smac_space,
-        lale_op_smac_tae,
-        lale_trainable_op_from_config,
-    )
+    from lale.search.lale_smac import get_smac_space, lale_trainable_op_from_config
 
     smac_installed = True
 except ImportError:
     smac_installed = False
 
+# numba is only imported when the log loss kernel is first needed, since
+# importing it takes a while and this module is imported with lale.lib.lale
+numba_installed = importlib.util.find_spec("numba") is not None
+
 logger = logging.getLogger(__name__)
 
+try:
+    _perf_counter_ns = time.perf_counter_ns
+except AttributeError:  # Python 3.6
+
+    def _perf_counter_ns():
+        return int(time.perf_counter() * 1e9)
+
+
+# converters of the best pipeline by the astype argument of get_pipeline
+_CONVERTERS = {
+    "lale": lambda result: result,
+    "sklearn": lale.sklearn_compat.make_sklearn_compat,
+}
+
+# training data larger than this is not cached on disk with cache_dir
+_DISK_CACHE_MAX_NBYTES = 1 << 30
+
+# training data larger than this is passed to the processes of n_jobs as
+# memory-mapped files
+_MEMMAP_MIN_NBYTES = 10 << 20
+
+# errors of a cross validation fold that handle_cv_failure recovers from,
+# any other error fails the trial
+_TRIAL_ERRORS = (ValueError, NotFittedError, np.linalg.LinAlgError, ArithmeticError)
+
+# maximum number of trial losses remembered by SMACImpl.fit
+_TRIAL_CACHE_SIZE = 256
+
+# z-score of the confidence bound used by prune_trials, and the penalty
+# added to the loss of pruned trials
+_PRUNING_Z_SCORE = 1.96
+_PRUNING_PENALTY = 1e-3
+
+
+# maximum number of search spaces remembered across SMACImpl instances
+_SEARCH_SPACE_CACHE_SIZE = 32
+_search_space_cache: "collections.OrderedDict[Any, Any]" = collections.OrderedDict()
+
+
+def _individual_ops(op):
+    if isinstance(op, lale.operators.IndividualOp):
+        yield op
+    else:
+        for step in op.steps():
+            yield from _individual_ops(step)
+
+
+def _cached_get_smac_space(estimator, lale_num_grids, data_schema):
+    """Like get_smac_space, but reuses the ConfigurationSpace of a previous
+    call with an equal estimator, lale_num_grids, and data schema, since
+    building it walks the entire pipeline.
+
+    Estimators are compared by their JSON and the hyperparameter schemas of
+    their operators, which customize_schema can change, since lale copies
+    the operators of each SMAC instance."""
+    estimator_key = json.dumps(
+        [
+            estimator.to_json(),
+            [op.hyperparam_schema() for op in _individual_ops(estimator)],
+        ],
+        sort_keys=True,
+        default=repr,
+    )
+    schema_key = json.dumps(data_schema, sort_keys=True, default=repr)
+    key = (estimator_key, lale_num_grids, schema_key)
+    if key in _search_space_cache:
+        _search_space_cache.move_to_end(key)
+        return _search_space_cache[key]
+    result = get_smac_space(
+        estimator, lale_num_grids=lale_num_grids, data_schema=data_schema
+    )
+    _search_space_cache[key] = result
+    if len(_search_space_cache) > _SEARCH_SPACE_CACHE_SIZE:
+        _search_space_cache.popitem(last=False)
+    return result
+
+
+def _config_hash(config):
+    items = sorted(config.get_dictionary().items())
+    return hashlib.sha256(repr(items).encode()).hexdigest()
+
+
+def _log_loss_loop(y_true, y_pred, eps):
+    n = y_true.shape[0]
+    acc = 0.0
+    for i in range(n):
+        p = min(max(y_pred[i, y_true[i]], eps), 1.0 - eps)
+        acc += -np.log(p)
+    return acc / n
+
+
+_log_loss_nb = None
+
+
+def _log_loss_kernel():
+    """_log_loss_loop compiled with numba, on the first call."""
+    global _log_loss_nb
+    if _log_loss_nb is None:
+        import numba
+
+        _log_loss_nb = numba.njit(fastmath=True, cache=True)(_log_loss_loop)
+    return _log_loss_nb
+
+
+def _welford_update(mean, m2, k, x):
+    """Welford's online update of the mean and the sum of squared deviations
+    m2 of k scores with one more score x."""
+    k += 1
+    delta = x - mean
+    mean += delta / k
+    m2 += delta * (x - mean)
+    return mean, m2, k
+
+
+def _dominated(mean, m2, k, incumbent_score):
+    """Whether the upper confidence bound of the mean of k >= 2 scores is
+    below incumbent_score."""
+    std_err = math.sqrt(m2 / (k - 1) / k)
+    return mean + _PRUNING_Z_SCORE * std_err < incumbent_score
+
+
+def _holdout_log_loss(y_train, y_true, y_pred_proba, eps=1e-15):
+    """Log loss of y_pred_proba, whose columns are the sorted labels of y_train.
+
+    Uses a numba kernel if available. Falls back to sklearn.metrics.log_loss
+    if numba is not installed or y_true can not be mapped onto the columns."""
+    if numba_installed:
+        labels = np.unique(y_train)
+        y_true = np.asarray(y_true)
+        if y_pred_proba.ndim == 2 and y_pred_proba.shape[1] == len(labels):
+            y_index = np.searchsorted(labels, y_true)
+            y_index[y_index == len(labels)] = 0
+            if np.all(labels[y_index] == y_true):
+                return _log_loss_kernel()(
+                    y_index.astype(np.int64),
+                    np.ascontiguousarray(y_pred_proba, dtype=np.float64),
+                    eps,
+                )
+    return log_loss(y_true=y_true, y_pred=y_pred_proba)
+
+
+def _split_frozen_prefix(op):
+    """Split a linear pipeline into its longest prefix of frozen trainable
+    steps and the remaining steps, or return (None, op) if there is no such
+    prefix. The prefix has no hyperparameters to tune, so it can be fitted
+    once per fold instead of once per fold and trial."""
+    if not isinstance(op, lale.operators.BasePipeline):
+        return None, op
+    steps = op.steps()
+    if op.edges() != list(zip(steps, steps[1:])):
+        return None, op
+    n_prefix = 0
+    while n_prefix < len(steps) - 1:
+        step = steps[n_prefix]
+        if not isinstance(step, lale.operators.TrainableIndividualOp):
+            break
+        if not step.is_frozen_trainable():
+            break
+        n_prefix += 1
+    if n_prefix == 0:
+        return None, op
+    prefix = lale.operators.make_pipeline(*steps[:n_prefix])
+    if n_prefix == len(steps) - 1:
+        return prefix, steps[-1]
+    return prefix, lale.operators.make_pipeline(*steps[n_prefix:])
+
+
+def _apply_prefix(prefix, X_train, y_train, X_test):
+    if prefix is None:
+        return X_train, X_test
+    trained_prefix = prefix.fit(X_train, y_train)
+    return trained_prefix.transform(X_train), trained_prefix.transform(X_test)
+
+
+def _make_fold_views(estimator, X, y, splits, prefix=None, with_keys=False):
+    """List of (X_train, y_train, X_test, y_test, fold_key) per split, where
+    fold_key is a hash of the training part if with_keys is set, else None."""
+    result = []
+    for train, test in splits:
+        X_train, y_train = lale.helpers.split_with_schemas(estimator, X, y, train)
+        X_test, y_test = lale.helpers.split_with_schemas(estimator, X, y, test, train)
+        X_train, X_test = _apply_prefix(prefix, X_train, y_train, X_test)
+        fold_key = joblib.hash((X_train, y_train)) if with_keys else None
+        result.append((X_train, y_train, X_test, y_test, fold_key))
+    return result
+
+
+def _is_array(X):
+    return isinstance(X, np.ndarray) and not isinstance(X, np.matrix)
+
+
+def _nbytes(X):
+    if hasattr(X, "memory_usage"):  # pandas
+        return int(X.memory_usage(index=False).sum())
+    return getattr(X, "nbytes", 0)
+
+
+def _memmap_fold_views(fold_views, folder, name):
+    """The fold views with their numpy arrays saved to files in folder and
+    loaded back as read-only memory maps, which joblib passes to worker
+    processes by file name instead of pickling their contents. Arrays
+    with a schema keep it, as a view of the memory map."""
+    result = []
+    for i, fold_view in enumerate(fold_views):
+        mapped = []
+        for j, part in enumerate(fold_view):
+            if _is_array(part) and not part.dtype.hasobject:
+                path = os.path.join(folder, "{}_{}_{}.npy".format(name, i, j))
+                np.save(path, part)
+                schema = getattr(part, "json_schema", None)
+                part = np.load(path, mmap_mode="r")
+                if schema is not None:
+                    part = lale.datasets.data_schemas.add_schema(part, schema)
+            mapped.append(part)
+        result.append(tuple(mapped))
+    return result
+
+
+def _strip_fold_view(fold_view):
+    """The parts of fold_view with arrays as plain numpy views, and their
+    schemas. joblib only passes plain numpy arrays by file name, and
+    pickling an array with a schema drops the schema."""
+    parts = tuple(np.asarray(part) if _is_array(part) else part for part in fold_view)
+    schemas = tuple(
+        getattr(part, "json_schema", None) if _is_array(part) else None
+        for part in fold_view
+    )
+    return parts, schemas
+
+
+def _fit_and_score_stripped(trainable, scorer, parts, schemas, memory=None):
+    fold_view = [
+        part if schema is None else lale.datasets.data_schemas.add_schema(part, schema)
+        for part, schema in zip(parts, schemas)
+    ]
+    return _fit_and_score(trainable, scorer, *fold_view, memory=memory)
+
+
+def _fit_fold(trainable_key, fold_key, trainable, X_train, y_train):
+    return trainable.fit(X_train, y_train)
+
+
+def _fit(trainable, X_train, y_train, fold_key=None, memory=None):
+    """Fit trainable, or load the result of an earlier identical fit from the
+    joblib.Memory disk cache, keyed by the JSON of trainable and the hash of
+    the training data."""
+    if memory is None or fold_key is None:
+        return trainable.fit(X_train, y_train)
+    trainable_json = json.dumps(trainable.to_json(), sort_keys=True, default=repr)
+    trainable_key = hashlib.sha256(trainable_json.encode()).hexdigest()
+    cached_fit = memory.cache(_fit_fold, ignore=["trainable", "X_train", "y_train"])
+    return cached_fit(trainable_key, fold_key, trainable, X_train, y_train)
+
+
+def _fit_and_score(
+    trainable, scorer, X_train, y_train, X_test, y_test, fold_key=None, memory=None
+):
+    """Score, log loss or None, and execution time in integer nanoseconds."""
+    start = _perf_counter_ns()
+    trained = _fit(trainable, X_train, y_train, fold_key, memory)
+    score_value = scorer(trained, X_test, y_test)
+    execution_time_ns = _perf_counter_ns() - start
+    logloss = lale.helpers.fold_log_loss(trained, X_test, y_test)
+    return score_value, logloss, execution_time_ns
+
+
+def _inline_cv(
+    trainable,
+    fold_views,
+    scorer,
+    on_fold_failure=None,
+    incumbent_score=None,
+    memory=None,
+):
+    """Mean score, log loss, and time in seconds over the folds, accumulated
+    in floats and integer nanoseconds, and whether the remaining folds were
+    skipped.
+
+    If on_fold_failure is given, it is called with the exception of a
+    failing fold and returns the (score, log loss, time in nanoseconds)
+    used in its place.
+
+    If incumbent_score is given, the folds stop early once the upper
+    confidence bound of the mean score drops below it, since the trial
+    can then no longer beat the incumbent."""
+    score_mean = 0.0
+    score_m2 = 0.0
+    n_scores = 0
+    logloss_sum = 0.0
+    n_logloss = 0
+    time_ns = 0
+    pruned = False
+    for X_train, y_train, X_test, y_test, fold_key in fold_views:
+        try:
+            score, logloss, execution_time_ns = _fit_and_score(
+                trainable, scorer, X_train, y_train, X_test, y_test, fold_key, memory
+            )
+        except _TRIAL_ERRORS as e:
+            if on_fold_failure is None:
+                raise
+            score, logloss, execution_time_ns = on_fold_failure(e)
+        score_mean, score_m2, n_scores = _welford_update(
+            score_mean, score_m2, n_scores, score
+        )
+        if logloss is not None:
+            logloss_sum += logloss
+            n_logloss += 1
+        time_ns += execution_time_ns
+        if incumbent_score is not None and 2 <= n_scores < len(fold_views):
+            if _dominated(score_mean, score_m2, n_scores, incumbent_score):
+                pruned = True
+                break
+    mean_logloss = logloss_sum / n_logloss if n_logloss > 0 else np.nan
+    return score_mean, mean_logloss, time_ns * 1e-9 / n_scores, pruned
+
+
+def _cross_val_score_fold_views(trainable, fold_views, scorer, n_jobs=1, memory=None):
+    """Like lale.helpers.cross_val_score_track_trials, but on folds that were
+    already sliced out of the data by _make_fold_views.
+
+    When n_jobs is not 1, memory-mapped folds from _memmap_fold_views are
+    passed to the worker processes by file name and other arrays are
+    pickled, since dumping them to new memory maps for each task would cost
+    as much. Schemas of the arrays are passed alongside and put back in the
+    workers."""
+    if n_jobs == 1:
+        score, logloss, execution_time, _ = _inline_cv(
+            trainable, fold_views, scorer, memory=memory
+        )
+        return score, logloss, execution_time
+    parallel = joblib.Parallel(
+        n_jobs=n_jobs, backend="loky", prefer="processes", max_nbytes=None
+    )
+    fold_results = parallel(
+        joblib.delayed(_fit_and_score_stripped)(
+            trainable, scorer, *_strip_fold_view(fold_view), memory=memory
+        )
+        for fold_view in fold_views
+    )
+    score, logloss, execution_time_ns = lale.helpers.mean_fold_results(fold_results)
+    return score, logloss, execution_time_ns * 1e-9
+
+
+def _try_cross_val_score_fold_views(trainable, fold_views, scorer, memory=None):
+    """Mean score over the folds, or the exception that failed a fold."""
+    try:
+        score, _, _, _ = _inline_cv(trainable, fold_views, scorer, memory=memory)
+        return score
+    except Exception as e:
+        return e
+
 
 class SMACImpl:
     def __init__(
@@ -60,6 +428,13 @@ class SMACImpl:
         best_score=0.0,
         max_opt_time=None,
         lale_num_grids=None,
+        budget_type=None,
+        eta=3,
+        n_jobs=1,
+        prune_trials=False,
+        precision="float64",
+        warm_start=False,
+        cache_dir=None,
     ):
         assert smac_installed, """Your Python environment does not have smac installed. You can install it with
     pip install smac<=0.10.0
@@ -84,101 +459,436 @@ or with
         self.cv = cv
         self.max_opt_time = max_opt_time
         self.lale_num_grids = lale_num_grids
+        self.budget_type = budget_type
+        self.eta = eta
+        self.n_jobs = n_jobs
+        self.prune_trials = prune_trials
+        self.precision = precision
+        self.warm_start = warm_start
+        self.cache_dir = cache_dir
         self.trials = None
 
+    def _num_halving_rounds(self, n_samples, n_folds, n_classes):
+        """Number of successive halving rounds to run before handing over to SMAC.
+
+        Limited both by max_evals (each round keeps 1/eta of the configurations)
+        and by the smallest budget that still supports cross validation."""
+        if self.budget_type is None:
+            return 0
+        if self.budget_type == "n_samples":
+            min_resources = 2 * n_folds * max(1, n_classes)
+            max_ratio = n_samples / min_resources
+        else:
+            assert self.budget_type == "cv_folds", self.budget_type
+            max_ratio = n_folds / 2
+        result = 0
+        while self.eta ** (result + 1) <= min(self.max_evals, max_ratio):
+            result += 1
+        return result
+
+    def _downcast(self, X_train, y_train, is_clf):
+        if self.precision != "float32":
+            return X_train, y_train
+        # only numeric arrays, including those with a lale schema, which
+        # astype keeps, since casting would drop the columns of other kinds
+        # of data
+        if _is_array(X_train) and X_train.dtype.kind in "fiu":
+            X_train = X_train.astype(np.float32, order="C")
+        if _is_array(y_train):
+            if is_clf and y_train.dtype.kind in "iu":
+                y_train = y_train.astype(np.int32)
+            elif not is_clf and y_train.dtype.kind == "f":
+                y_train = y_train.astype(np.float32)
+        return X_train, y_train
+
     def fit(self, X_train, y_train):
-        data_schema = lale.helpers.fold_schema(
-            X_train, y_train, self.cv, self.estimator.is_classifier()
+        opt_start_time = _perf_counter_ns()
+
+        def elapsed_time():
+            return (_perf_counter_ns() - opt_start_time) * 1e-9
+
+        is_clf = self.estimator.is_classifier()
+        # the best estimator is trained on the original data at the end
+        X_orig, y_orig = X_train, y_train
+        X_train, y_train = self._downcast(X_train, y_train, is_clf)
+        # Frozen preprocessing at the start of the pipeline is fitted once per
+        # fold, outside of the trials, which only search over the rest.
+        prefix, search_estimator = _split_frozen_prefix(self.estimator)
+        if prefix is None:
+            X_schema = X_train
+        else:
+            X_schema = prefix.fit(X_train, y_train).transform(X_train)
+        data_schema = lale.helpers.fold_schema(X_schema, y_train, self.cv, is_clf)
+        self.search_space: ConfigurationSpace = _cached_get_smac_space(
+            search_estimator, self.lale_num_grids, data_schema
         )
-        self.search_space: ConfigurationSpace = get_smac_space(
-            self.estimator, lale_num_grids=self.lale_num_grids, data_schema=data_schema
+
+        self.cv = check_cv(self.cv, y=y_train, classifier=is_clf)
+        n_folds = self.cv.get_n_splits(X_train, y_train)
+        n_classes = len(np.unique(y_train)) if is_clf else 1
+
+        # Fitted folds can be reused across fits and instances from a disk
+        # cache, except for data so large that the cache would only churn.
+        memory = None
+        if self.cache_dir is not None and _nbytes(X_train) <= _DISK_CACHE_MAX_NBYTES:
+            memory = joblib.Memory(location=self.cache_dir, verbose=0)
+        with_keys = memory is not None
+
+        # Computing the splits and slicing the data for each of them is the
+        # same for all trials, so do it only once. The folds are local to fit,
+        # so the fitted operator does not keep copies of the training data.
+        all_fold_views = _make_fold_views(
+            self.estimator,
+            X_train,
+            y_train,
+            list(self.cv.split(X_train, y_train)),
+            prefix,
+            with_keys,
         )
-        # Scenario object
-        scenario_options = {
-            "run_obj": "quality",  # optimize quality (alternatively runtime)
-            "runcount-limit": self.max_evals,  # maximum function evaluations
-            "cs": self.search_space,  # configuration space
-            "deterministic": "true",
-            "abort_on_first_run_crash": False,
-        }
-        if self.max_opt_time is not None:
-            scenario_options["wallclock_limit"] = self.max_opt_time
-        self.scenario = Scenario(scenario_options)
+        # Large folds are written to memory-mapped files once per fit, which
+        # the worker processes of n_jobs share instead of each receiving a
+        # pickled copy for every trial.
+        memmap_folder = None
+        if self.n_jobs != 1 and _nbytes(X_train) > _MEMMAP_MIN_NBYTES:
+            memmap_folder = tempfile.mkdtemp(prefix="lale_smac_")
+            all_fold_views = _memmap_fold_views(all_fold_views, memmap_folder, "folds")
+        # stratified subsamples and their fold views, by number of samples
+        subsamples = {}
 
-        self.cv = check_cv(
-            self.cv, y=y_train, classifier=self.estimator.is_classifier()
+        def subsample(budget):
+            # Stratified, so that small budgets keep the class balance, and
+            # drawn only once per budget level, so all configurations of a
+            # round are compared on the same data.
+            n_samples = int(budget * len(y_train))
+            if n_samples in subsamples:
+                return subsamples[n_samples]
+            if is_clf:
+                splitter = StratifiedShuffleSplit(
+                    n_splits=1, train_size=n_samples, random_state=42
+                )
+            else:
+                splitter = ShuffleSplit(
+                    n_splits=1, train_size=n_samples, random_state=42
+                )
+            indices, _ = next(splitter.split(np.zeros(len(y_train)), y_train))
+            X_sub, y_sub = lale.helpers.split_with_schemas(
+                self.estimator, X_train, y_train, indices
+            )
+            splits = list(self.cv.split(X_sub, y_sub))
+            fold_views = _make_fold_views(
+                self.estimator, X_sub, y_sub, splits, prefix, with_keys
+            )
+            if memmap_folder is not None:
+                fold_views = _memmap_fold_views(
+                    fold_views, memmap_folder, "subsample{}".format(n_samples)
+                )
+            subsamples[n_samples] = (fold_views, X_sub, y_sub)
+            return subsamples[n_samples]
+
+        def budget_folds(budget):
+            return min(n_folds, max(2, int(budget * n_folds)))
+
+        def budget_data(budget):
+            if budget < 1.0:
+                if self.budget_type == "n_samples":
+                    return subsample(budget)
+                elif self.budget_type == "cv_folds":
+                    n_budget_folds = budget_folds(budget)
+                    return all_fold_views[:n_budget_folds], X_train, y_train
+            return all_fold_views, X_train, y_train
+
+        def budget_cost(budget):
+            # fraction of the fit work of a trial on the full budget
+            if budget < 1.0 and self.budget_type == "cv_folds":
+                return budget_folds(budget) / n_folds
+            return budget
+
+        scorer = check_scoring(
+            lale.sklearn_compat.make_sklearn_compat(self.estimator),
+            scoring=self.scoring,
         )
 
-        def smac_train_test(trainable, X_train, y_train):
+        def holdout_train_test(trainable, X_train, y_train):
+            # Score based on a random train-test split, used as the evaluation
+            # criterion when cross validation fails and handle_cv_failure is set.
+            (
+                X_train_part,
+                X_validation,
+                y_train_part,
+                y_validation,
+            ) = train_test_split(X_train, y_train, test_size=0.20)
+            start = _perf_counter_ns()
+            X_train_part, X_validation = _apply_prefix(
+                prefix, X_train_part, y_train_part, X_validation
+            )
+            trained = trainable.fit(X_train_part, y_train_part)
+            score = scorer(trained, X_validation, y_validation)
+            execution_time_ns = _perf_counter_ns() - start
+            y_pred_proba = trained.predict_proba(X_validation)
             try:
-                cv_score, logloss, execution_time = cross_val_score_track_trials(
-                    trainable, X_train, y_train, cv=self.cv, scoring=self.scoring
-                )
+                logloss = _holdout_log_loss(y_train_part, y_validation, y_pred_proba)
+            except Exception:
+                logloss = 0
+                logger.debug("Warning, log loss cannot be computed")
+            return score, logloss, execution_time_ns
+
+        def smac_train_test(trainable, budget=1.0):
+            fold_views, X_train, y_train = budget_data(budget)
+            holdout_result = None
+            pruned = False
+            incumbent_score = None
+            if self.prune_trials:
+                incumbent_score = self._incumbent_scores.get(budget)
+
+            def on_fold_failure(e):
+                # only the failing folds use the holdout score, computed once
+                nonlocal holdout_result
+                logger.debug("Error {} in a fold, using a holdout split".format(e))
+                if holdout_result is None:
+                    holdout_result = holdout_train_test(trainable, X_train, y_train)
+                return holdout_result
+
+            try:
+                if self.n_jobs == 1:
+                    cv_score, logloss, execution_time, pruned = _inline_cv(
+                        trainable,
+                        fold_views,
+                        scorer,
+                        on_fold_failure if self.handle_cv_failure else None,
+                        incumbent_score,
+                        memory,
+                    )
+                else:
+                    cv_score, logloss, execution_time = _cross_val_score_fold_views(
+                        trainable, fold_views, scorer, self.n_jobs, memory
+                    )
                 logger.debug("Successful trial of SMAC")
-            except BaseException as e:
-                # If there is any error in cross validation, use the score based on a random train-test split as the evaluation criterion
+            except _TRIAL_ERRORS as e:
                 if self.handle_cv_failure:
-                    (
-                        X_train_part,
-                        X_validation,
-                        y_train_part,
-                        y_validation,
-                    ) = train_test_split(X_train, y_train, test_size=0.20)
-                    start = time.time()
-                    trained = trainable.fit(X_train_part, y_train_part)
-                    scorer = check_scoring(trainable, scoring=self.scoring)
-                    cv_score = scorer(trained, X_validation, y_validation)
-                    execution_time = time.time() - start
-                    y_pred_proba = trained.predict_proba(X_validation)
-                    try:
-                        logloss = log_loss(y_true=y_validation, y_pred=y_pred_proba)
-                    except BaseException:
-                        logloss = 0
-                        logger.debug("Warning, log loss cannot be computed")
+                    cv_score, logloss, execution_time_ns = holdout_train_test(
+                        trainable, X_train, y_train
+                    )
+                    execution_time = execution_time_ns * 1e-9
                 else:
                     logger.debug(
                         "Error {} with pipeline:{}".format(e, trainable.to_json())
                     )
                     raise e
-            return cv_score, logloss, execution_time
+            return cv_score, logloss, execution_time, pruned
 
-        def f(trainable):
+        # best mean cross validation score of completed trials, per budget
+        self._incumbent_scores = {}
+
+        def f(trainable, budget=1.0):
             return_dict = {}
             try:
-                score, logloss, execution_time = smac_train_test(
-                    trainable, X_train=X_train, y_train=y_train
+                score, logloss, execution_time, pruned = smac_train_test(
+                    trainable, budget=budget
                 )
                 return_dict = {
                     "loss": self.best_score - score,
                     "time": execution_time,
                     "log_loss": logloss,
                 }
-            except BaseException as e:
+                if pruned:
+                    return_dict["loss"] += _PRUNING_PENALTY
+                elif score > self._incumbent_scores.get(budget, -np.inf):
+                    self._incumbent_scores[budget] = score
+            except Exception as e:
                 logger.warning(
-                    f"Exception caught in SMACCV:{type(e)}, {traceback.format_exc()}, SMAC will set a cost_for_crash to MAXINT."
+                    f"Exception caught in SMACCV:{type(e)}, {repr(e)}, SMAC will set a cost_for_crash to MAXINT."
                 )
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(traceback.format_exc())
                 raise e
             return return_dict["loss"]
 
+        def check_budget():
+            if (self.max_opt_time is not None) and (elapsed_time() > self.max_opt_time):
+                raise BudgetExhaustedException
+
+        self._trial_cache = collections.OrderedDict()
+
+        def evaluate_config(config, budget=1.0):
+            # SMAC and successive halving can propose the same configuration
+            # more than once, so remember the losses of recent trials.
+            key = (_config_hash(config), budget)
+            if key in self._trial_cache:
+                self._trial_cache.move_to_end(key)
+                return self._trial_cache[key]
+            trainable = lale_trainable_op_from_config(search_estimator, config)
+            loss = f(trainable, budget=budget)
+            remember(key, loss)
+            return loss
+
+        def remember(key, loss):
+            self._trial_cache[key] = loss
+            if len(self._trial_cache) > _TRIAL_CACHE_SIZE:
+                self._trial_cache.popitem(last=False)
+
+        def smac_tae(config):
+            # Runs in this process (see ExecuteTAFuncDict below), where SMAC
+            # records a trial that returns None as crashed, with the crash
+            # cost. Checking max_opt_time here stops before starting a trial
+            # that is over budget, rather than waiting for the wall-clock
+            # check of SMAC.
+            check_budget()
+            try:
+                return evaluate_config(config)
+            except BudgetExhaustedException:
+                raise
+            except Exception:
+                return None
+
+        def evaluate_configs(configs, budget):
+            # Evaluate a batch of configurations on the same budget, so the
+            # data for the budget is prepared only once, and the configurations
+            # are fitted in parallel with n_jobs. The jobs are threads that
+            # share the fold views, instead of processes that each receive a
+            # pickled copy of them; numpy and most fit methods release the GIL
+            # for the heavy lifting. With handle_cv_failure, the configurations
+            # that fail in the batch are evaluated again one by one, so that
+            # their failing folds use the holdout fallback.
+            losses = np.full(len(configs), np.inf)
+            pending = []
+            for i, config in enumerate(configs):
+                key = (_config_hash(config), budget)
+                if key in self._trial_cache:
+                    self._trial_cache.move_to_end(key)
+                    losses[i] = self._trial_cache[key]
+                else:
+                    pending.append(i)
+            if self.n_jobs != 1 and len(pending) > 1:
+                fold_views, _, _ = budget_data(budget)
+                parallel = joblib.Parallel(n_jobs=self.n_jobs, prefer="threads")
+                scores = parallel(
+                    joblib.delayed(_try_cross_val_score_fold_views)(
+                        lale_trainable_op_from_config(search_estimator, configs[i]),
+                        fold_views,
+                        scorer,
+                        memory,
+                    )
+                    for i in pending
+                )
+                failed = []
+                for i, score in zip(pending, scores):
+                    if not isinstance(score, Exception):
+                        losses[i] = self.best_score - score
+                        remember((_config_hash(configs[i]), budget), losses[i])
+                        if score > self._incumbent_scores.get(budget, -np.inf):
+                            self._incumbent_scores[budget] = score
+                    elif self.handle_cv_failure and isinstance(score, _TRIAL_ERRORS):
+                        failed.append(i)
+                    else:
+                        logger.warning(
+                            f"Exception caught in SMACCV:{type(score)}, {repr(score)}, the configuration is not promoted."
+                        )
+                pending = failed
+            for i in pending:
+                check_budget()
+                try:
+                    losses[i] = evaluate_config(configs[i], budget=budget)
+                except BudgetExhaustedException:
+                    raise
+                except Exception:
+                    losses[i] = np.inf
+            return losses
+
+        def successive_halving():
+            # Evaluate many configurations on small budgets and only promote the
+            # best 1/eta of them to the next budget, following Hyperband. The
+            # survivors are used to seed the initial design of SMAC, which
+            # evaluates configurations on the full budget. Also returns the
+            # number of full-budget trials that the rounds cost.
+            n_rounds = self._num_halving_rounds(len(y_train), n_folds, n_classes)
+            if n_rounds == 0:
+                if self.budget_type is not None:
+                    logger.warning(
+                        "No successive halving round fits budget_type {}, eta {}, "
+                        "{} folds, and max_evals {}, so SMAC starts on the full "
+                        "budget.".format(
+                            self.budget_type, self.eta, n_folds, self.max_evals
+                        )
+                    )
+                return None, 0.0
+            self.search_space.seed(42)
+            configs = self.search_space.sample_configuration(size=self.max_evals)
+            if not isinstance(configs, list):
+                configs = [configs]
+            cost = 0.0
+            for s in range(n_rounds):
+                budget = self.eta ** (s - n_rounds)
+                check_budget()
+                losses = evaluate_configs(configs, budget)
+                cost += len(configs) * budget_cost(budget)
+                # SMAC rejects an initial design of a single configuration,
+                # counting duplicates only once
+                n_keep = max(2, len(configs) // self.eta)
+                ranked = [configs[i] for i in np.argsort(losses, kind="stable")]
+                configs = list(collections.OrderedDict.fromkeys(ranked))[:n_keep]
+            if len(configs) == 1:
+                default = self.search_space.get_default_configuration()
+                if configs[0] == default:
+                    return None, cost
+                configs.append(default)
+            return configs, cost
+
         try:
+            initial_configurations, halving_cost = successive_halving()
+            # The rounds of successive halving count against max_evals, but
+            # SMAC still evaluates each of their survivors on the full budget.
+            runcount_limit = self.max_evals - int(math.ceil(halving_cost))
+            if initial_configurations is not None:
+                runcount_limit = max(runcount_limit, len(initial_configurations))
+            # Scenario object
+            scenario_options = {
+                "run_obj": "quality",  # optimize quality (alternatively runtime)
+                "runcount-limit": runcount_limit,  # maximum function evaluations
+                "cs": self.search_space,  # configuration space
+                "deterministic": "true",
+                "abort_on_first_run_crash": False,
+            }
+            if self.max_opt_time is not None:
+                remaining_time = self.max_opt_time - elapsed_time()
+                scenario_options["wallclock_limit"] = max(0.0, remaining_time)
+            self.scenario = Scenario(scenario_options)
+            smac_kwargs = {}
+            if self.warm_start and self.trials is not None:
+                # SMAC fits its surrogate model on the previous runs too
+                smac_kwargs["runhistory"] = self.trials
             smac = orig_SMAC(
                 scenario=self.scenario,
                 rng=np.random.RandomState(42),
-                tae_runner=lale_op_smac_tae(self.estimator, f),
+                # Evaluate the trials in this process instead of one
+                # subprocess per trial, so that they share the cached folds
+                # and trial losses.
+                tae_runner=ExecuteTAFuncDict(
+                    ta=smac_tae, run_obj="quality", use_pynisher=False
+                ),
+                initial_configurations=initial_configurations,
+                **smac_kwargs,
             )
             incumbent = smac.optimize()
             self.trials = smac.get_runhistory()
-            trainable = lale_trainable_op_from_config(self.estimator, incumbent)
+            trainable = lale_trainable_op_from_config(search_estimator, incumbent)
+            if prefix is not None:
+                trainable = lale.operators.make_pipeline(prefix, trainable.to_lale())
             # get the trainable corresponding to the best params and train it on the entire training dataset.
-            trained = trainable.fit(X_train, y_train)
+            trained = trainable.fit(X_orig, y_orig)
             self._best_estimator = trained
         except BudgetExhaustedException:
             logger.warning(
                 "Maximum alloted optimization time exceeded. Optimization exited prematurely"
             )
-        except BaseException as e:
+        except Exception as e:
             logger.warning("Error during optimization: {}".format(e))
             self._best_estimator = None
+        finally:
+            if memmap_folder is not None:
+                # release the memory maps before removing their files
+                all_fold_views = None
+                subsamples.clear()
+                shutil.rmtree(memmap_folder, ignore_errors=True)
 
         return self
 
@@ -213,10 +923,13 @@ or with
         if pipeline_name is not None:
             raise NotImplementedError("Cannot get pipeline by name yet.")
         result = getattr(self, "_best_estimator", None)
-        if result is None or astype == "lale":
+        if result is None:
             return result
-        assert astype == "sklearn", astype
-        return lale.sklearn_compat.make_sklearn_compat(result)
+        try:
+            converter = _CONVERTERS[astype]
+        except KeyError:
+            raise ValueError(f"unknown astype {astype!r}")
+        return converter(result)
 
 
 _hyperparams_schema = {
@@ -230,6 +943,13 @@ _hyperparams_schema = {
                 "handle_cv_failure",
                 "max_opt_time",
                 "lale_num_grids",
+                "budget_type",
+                "eta",
+                "n_jobs",
+                "prune_trials",
+                "precision",
+                "warm_start",
+                "cache_dir",
             ],
             "relevantToOptimizer": ["estimator"],
             "additionalProperties": False,
@@ -242,7 +962,11 @@ _hyperparams_schema = {
                             "description": "lale.lib.sklearn.LogisticRegression",
                         },
                     ],
-                    "description": "A valid Lale operator or pipeline.",
+                    "description": """A valid Lale operator or pipeline.
+
+The leading steps of a linear pipeline that are frozen trainable, i.e.,
+that have no hyperparameters left to tune, are fitted only once per cross
+validation fold and shared by all trials.""",
                     "default": None,
                 },
                 "max_evals": {
@@ -275,7 +999,9 @@ https://scikit-learn.org/stable/modules/cross_validation.html#cross-validation-i
 
 If True, continue the trial by doing a 80-20 percent train-validation
 split of the dataset input to fit and report the score on the
-validation part. If False, terminate the trial with FAIL status.""",
+validation part. If False, terminate the trial with FAIL status.
+Only numeric errors such as ValueError, NotFittedError, LinAlgError,
+or ArithmeticError are handled, any other error terminates the trial.""",
                     "type": "boolean",
                     "default": False,
                 },
@@ -366,6 +1092,102 @@ where zero is the best loss.""",
                     ],
                     "default": None,
                 },
+                "budget_type": {
+                    "description": """Resource used for successive halving before the SMAC search.
+
+Successive halving evaluates max_evals randomly sampled configurations
+on a small budget and promotes only the best 1/eta of them to the next,
+eta times larger budget. The survivors seed the initial design of SMAC,
+which then evaluates configurations on the full budget. The rounds count
+against max_evals by their cost in full-budget trials.
+
+A round needs max_evals of at least eta. For cv_folds, a round also needs
+at least 2 * eta folds, e.g., cv=6 for the default eta=3. For n_samples,
+it needs at least eta * 2 * folds * classes training samples. If no
+round fits, fit logs a warning and runs SMAC on the full budget.""",
+                    "anyOf": [
+                        {
+                            "description": "Evaluate every configuration on the full budget.",
+                            "enum": [None],
+                        },
+                        {
+                            "description": "Budget is a stratified subsample of the training data.",
+                            "enum": ["n_samples"],
+                        },
+                        {
+                            "description": "Budget is the number of cross validation folds.",
+                            "enum": ["cv_folds"],
+                        },
+                    ],
+                    "default": None,
+                },
+                "eta": {
+                    "description": "Reduction factor of successive halving, only 1/eta of the configurations of a round are promoted to the next round.",
+                    "type": "integer",
+                    "minimum": 2,
+                    "default": 3,
+                },
+                "n_jobs": {
+                    "description": """Number of parallel jobs.
+
+In a trial, the cross validation folds are fitted in parallel processes.
+In a round of successive halving (see budget_type), the configurations
+of the round are evaluated in parallel threads instead, each fitting its
+folds one after the other.""",
+                    "anyOf": [
+                        {"description": "Use all processors.", "enum": [-1]},
+                        {
+                            "description": "Number of jobs to run in parallel.",
+                            "type": "integer",
+                            "minimum": 1,
+                        },
+                    ],
+                    "default": 1,
+                },
+                "prune_trials": {
+                    "description": """Whether to stop the cross validation of a trial early.
+
+If True, a trial skips its remaining folds once the upper bound of the
+95% confidence interval of its mean score is below the best mean score
+so far, and reports its partial mean loss plus a small penalty to SMAC.
+Only applies to sequential cross validation, i.e., n_jobs=1.""",
+                    "type": "boolean",
+                    "default": False,
+                },
+                "precision": {
+                    "description": """Floating point precision of the training data during the search.
+
+With float32, numeric numpy arrays X are cast once to contiguous float32,
+and y to int32 for classification or float32 for regression. This halves
+the memory traffic of the search. Estimators that internally upcast to
+float64 do not benefit, and pandas dataframes are left unchanged. The
+best configuration is trained on the original data.""",
+                    "enum": ["float64", "float32"],
+                    "default": "float64",
+                },
+                "cache_dir": {
+                    "description": """Directory for a joblib.Memory cache of the models fitted on each fold.
+
+Fits with the same pipeline and hyperparameters on the same fold data
+are loaded from the cache instead of being repeated, also across
+instances and processes. Not used when X is larger than 1 GB.""",
+                    "anyOf": [
+                        {"type": "string"},
+                        {"description": "No disk cache.", "enum": [None]},
+                    ],
+                    "default": None,
+                },
+                "warm_start": {
+                    "description": """Whether to continue from the trials of the previous fit.
+
+If True, a repeated call to fit passes the RunHistory of the previous
+call (see get_trials) to SMAC, which bootstraps its surrogate model from
+those runs. The previous costs were measured on the previous data, so
+the search is no longer determined by the current data alone. The
+estimator should stay the same between calls.""",
+                    "type": "boolean",
+                    "default": False,
+                },
             },
         }
     ]
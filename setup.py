@@ -44,6 +44,7 @@ else:
         "black",
         "graphviz",
         "hyperopt",
+        "joblib",
         "jsonschema",
         "jsonsubschema",
         "scikit-learn>=0.20.3",
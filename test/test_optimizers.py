@@ -183,6 +183,10 @@ class TestSMAC(unittest.TestCase):
         # at least one trial (correspond to KNN).
         trials = res._impl.get_trials()
         assert 2147483647.0 in trials.cost_per_config.values()
+        from smac.tae.execute_ta_run import StatusType
+
+        statuses = [run_value.status for run_value in trials.data.values()]
+        self.assertIn(StatusType.CRASHED, statuses)
 
     def test_smac_timeout_zero_classification(self):
         from lale.lib.lale import SMAC
@@ -259,6 +263,353 @@ class TestSMAC(unittest.TestCase):
             max_opt_time, opt_time, rel_diff
         )
 
+    def test_smac_successive_halving_n_samples(self):
+        from lale.lib.lale import SMAC
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        opt = SMAC(estimator=planned_pipeline, max_evals=3, budget_type="n_samples")
+        res = opt.fit(self.X_train, self.y_train)
+        self.assertIsNotNone(res.get_pipeline())
+        # the halving round costs one of the three full-budget trials
+        self.assertEqual(len(res._impl.get_trials().data), 2)
+        _ = res.predict(self.X_test)
+
+    def test_smac_successive_halving_cv_folds(self):
+        from lale.lib.lale import SMAC
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        opt = SMAC(
+            estimator=planned_pipeline, max_evals=3, cv=6, budget_type="cv_folds"
+        )
+        res = opt.fit(self.X_train, self.y_train)
+        self.assertIsNotNone(res.get_pipeline())
+        self.assertEqual(len(res._impl.get_trials().data), 2)
+        _ = res.predict(self.X_test)
+
+    def test_smac_successive_halving_parallel(self):
+        from unittest import mock
+
+        import lale.lib.lale.smac
+        from lale.lib.lale import SMAC
+
+        try_cross_val_score = lale.lib.lale.smac._try_cross_val_score_fold_views
+        batch_scores = []
+
+        def record_score(*args, **kwargs):
+            score = try_cross_val_score(*args, **kwargs)
+            batch_scores.append(score)
+            return score
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        opt = SMAC(
+            estimator=planned_pipeline,
+            max_evals=3,
+            budget_type="n_samples",
+            n_jobs=2,
+        )
+        with mock.patch.object(
+            lale.lib.lale.smac, "_try_cross_val_score_fold_views", record_score
+        ):
+            res = opt.fit(self.X_train, self.y_train)
+        self.assertEqual(len(batch_scores), 3)
+        for score in batch_scores:
+            self.assertGreater(score, 0.0)
+            self.assertLessEqual(score, 1.0)
+        incumbent_scores = res._impl._incumbent_scores
+        self.assertEqual(incumbent_scores[min(incumbent_scores)], max(batch_scores))
+        self.assertIsNotNone(res.get_pipeline())
+
+    def test_smac_successive_halving_parallel_failure(self):
+        from unittest import mock
+
+        import lale.lib.lale.smac
+        from lale.lib.lale import SMAC
+
+        cross_val_score = lale.lib.lale.smac._cross_val_score_fold_views
+        for handle_cv_failure in [False, True]:
+            train_sizes = []
+
+            def record_train_size(trainable, fold_views, *args, **kwargs):
+                train_sizes.append(len(fold_views[0][0]))
+                return cross_val_score(trainable, fold_views, *args, **kwargs)
+
+            planned_pipeline = (PCA | NoOp) >> LogisticRegression
+            opt = SMAC(
+                estimator=planned_pipeline,
+                max_evals=3,
+                budget_type="n_samples",
+                n_jobs=2,
+                handle_cv_failure=handle_cv_failure,
+            )
+            with mock.patch.object(
+                lale.lib.lale.smac,
+                "_try_cross_val_score_fold_views",
+                return_value=ValueError("failed in the batch"),
+            ), mock.patch.object(
+                lale.lib.lale.smac, "_cross_val_score_fold_views", record_train_size
+            ):
+                res = opt.fit(self.X_train, self.y_train)
+            # only handle_cv_failure evaluates the failed configurations again,
+            # on the subsample folds of the halving round
+            n_reruns = len([n for n in train_sizes if n < len(self.X_train) / 2])
+            self.assertEqual(n_reruns, 3 if handle_cv_failure else 0)
+            self.assertIsNotNone(res.get_pipeline())
+
+    def test_smac_successive_halving_no_round(self):
+        from lale.lib.lale import SMAC
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        opt = SMAC(
+            estimator=planned_pipeline, max_evals=3, cv=5, budget_type="cv_folds"
+        )
+        with self.assertLogs("lale.lib.lale.smac", level="WARNING") as logs:
+            res = opt.fit(self.X_train, self.y_train)
+        self.assertIn("No successive halving round", logs.output[0])
+        self.assertIsNotNone(res.get_pipeline())
+
+    def test_smac_parallel_folds(self):
+        from lale.lib.lale import SMAC
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        opt = SMAC(estimator=planned_pipeline, max_evals=2, n_jobs=2)
+        res = opt.fit(self.X_train, self.y_train)
+        self.assertIsNotNone(res.get_pipeline())
+
+    def test_smac_prune_trials(self):
+        from lale.lib.lale import SMAC
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        opt = SMAC(estimator=planned_pipeline, max_evals=3, prune_trials=True)
+        res = opt.fit(self.X_train, self.y_train)
+        self.assertIsNotNone(res.get_pipeline())
+
+    def test_smac_search_space_reused(self):
+        from lale.lib.lale import SMAC
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        res1 = SMAC(estimator=planned_pipeline, max_evals=1).fit(
+            self.X_train, self.y_train
+        )
+        res2 = SMAC(estimator=planned_pipeline, max_evals=1).fit(
+            self.X_train, self.y_train
+        )
+        self.assertIs(res1._impl.search_space, res2._impl.search_space)
+        # customize_schema changes the search space but not the JSON
+        customized = LogisticRegression.customize_schema(relevantToOptimizer=["C"])
+        res3 = SMAC(estimator=customized, max_evals=1).fit(self.X_train, self.y_train)
+        res4 = SMAC(estimator=LogisticRegression, max_evals=1).fit(
+            self.X_train, self.y_train
+        )
+        self.assertIsNot(res3._impl.search_space, res4._impl.search_space)
+
+    def test_smac_frozen_prefix(self):
+        from lale.lib.lale import SMAC
+
+        planned_pipeline = StandardScaler().freeze_trainable() >> (
+            LogisticRegression | KNeighborsClassifier
+        )
+        opt = SMAC(estimator=planned_pipeline, max_evals=2)
+        res = opt.fit(self.X_train, self.y_train)
+        best = res.get_pipeline()
+        self.assertIsNotNone(best)
+        self.assertEqual(len(best.steps()), 2)
+        _ = res.predict(self.X_test)
+
+    def test_smac_precision_float32(self):
+        from unittest import mock
+
+        import lale.lib.lale.smac
+        from lale.lib.lale import SMAC
+
+        opt = SMAC(estimator=LogisticRegression(), max_evals=2, precision="float32")
+        with mock.patch.object(
+            lale.lib.lale.smac,
+            "_make_fold_views",
+            wraps=lale.lib.lale.smac._make_fold_views,
+        ) as make_fold_views:
+            res = opt.fit(self.X_train, self.y_train)
+        self.assertIsNotNone(res.get_pipeline())
+        X_searched = make_fold_views.call_args[0][1]
+        self.assertEqual(X_searched.dtype, np.float32)
+        # the best estimator is trained on the original data
+        predictions = res.predict(self.X_test)
+        self.assertEqual(predictions.dtype, self.y_train.dtype)
+
+    def test_smac_get_pipeline_astype(self):
+        from lale.lib.lale import SMAC
+
+        opt = SMAC(estimator=LogisticRegression(), max_evals=1)
+        res = opt.fit(self.X_train, self.y_train)
+        self.assertIsNotNone(res.get_pipeline(astype="sklearn"))
+        with self.assertRaises(ValueError):
+            res.get_pipeline(astype="onnx")
+
+    def test_smac_warm_start(self):
+        from lale.lib.lale import SMAC
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        opt = SMAC(estimator=planned_pipeline, max_evals=2, warm_start=True)
+        res1 = opt.fit(self.X_train, self.y_train)
+        n_runs1 = len(res1._impl.get_trials().data)
+        res2 = res1.fit(self.X_train, self.y_train)
+        n_runs2 = len(res2._impl.get_trials().data)
+        self.assertGreater(n_runs2, n_runs1)
+
+    def test_smac_cache_dir(self):
+        import os
+        import tempfile
+
+        from lale.lib.lale import SMAC
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        with tempfile.TemporaryDirectory() as cache_dir:
+            opt = SMAC(estimator=planned_pipeline, max_evals=2, cache_dir=cache_dir)
+            res = opt.fit(self.X_train, self.y_train)
+            self.assertTrue(os.listdir(cache_dir))
+            predictions = res.predict(self.X_test)
+            self.assertEqual(len(predictions), len(self.y_test))
+
+    def test_smac_parallel_folds_memmap(self):
+        import os
+        import tempfile
+        from unittest import mock
+
+        import numpy as np
+
+        import lale.lib.lale.smac
+        from lale.lib.lale import SMAC
+
+        memmap_fold_views = lale.lib.lale.smac._memmap_fold_views
+        mapped_parts = []
+
+        def record_memmap_fold_views(fold_views, folder, name):
+            result = memmap_fold_views(fold_views, folder, name)
+            for fold_view, mapped in zip(fold_views, result):
+                for part, mapped_part in zip(fold_view, mapped):
+                    if isinstance(mapped_part, np.memmap) or isinstance(
+                        getattr(mapped_part, "base", None), np.memmap
+                    ):
+                        mapped_parts.append((part, mapped_part))
+            return result
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        opt = SMAC(estimator=planned_pipeline, max_evals=2, n_jobs=2)
+        with tempfile.TemporaryDirectory() as temp_dir, mock.patch.object(
+            lale.lib.lale.smac, "_memmap_fold_views", record_memmap_fold_views
+        ):
+            with mock.patch.object(
+                lale.lib.lale.smac, "_MEMMAP_MIN_NBYTES", 0
+            ), mock.patch.object(tempfile, "tempdir", temp_dir):
+                res = opt.fit(self.X_train, self.y_train)
+            memmap_dirs = [
+                n for n in os.listdir(temp_dir) if n.startswith("lale_smac_")
+            ]
+            self.assertEqual(memmap_dirs, [])
+        self.assertGreater(len(mapped_parts), 0)
+        for part, mapped_part in mapped_parts:
+            self.assertEqual(
+                getattr(mapped_part, "json_schema", None),
+                getattr(part, "json_schema", None),
+            )
+        self.assertIsNotNone(res.get_pipeline())
+
+    def test_smac_trial_cache(self):
+        from unittest import mock
+
+        import lale.lib.lale.smac
+        from lale.lib.lale import SMAC
+
+        sample_configuration = (
+            lale.lib.lale.smac.ConfigurationSpace.sample_configuration
+        )
+
+        def sample_copies(space, size=1):
+            config = sample_configuration(space)
+            return config if size == 1 else [config] * size
+
+        planned_pipeline = (PCA | NoOp) >> LogisticRegression
+        opt = SMAC(estimator=planned_pipeline, max_evals=3, budget_type="n_samples")
+        with mock.patch.object(
+            lale.lib.lale.smac.ConfigurationSpace,
+            "sample_configuration",
+            sample_copies,
+        ), mock.patch.object(
+            lale.lib.lale.smac, "_inline_cv", wraps=lale.lib.lale.smac._inline_cv
+        ) as inline_cv:
+            res = opt.fit(self.X_train, self.y_train)
+        self.assertIsNotNone(res.get_pipeline())
+        # the halving round evaluates three copies of the same configuration
+        # on the same subsample, but only fits the first
+        halving_folds = inline_cv.call_args_list[0][0][1]
+        halving_calls = [
+            call for call in inline_cv.call_args_list if call[0][1] is halving_folds
+        ]
+        self.assertEqual(len(halving_calls), 1)
+
+    def test_smac_holdout_log_loss(self):
+        from sklearn.metrics import log_loss
+
+        from lale.lib.lale.smac import _holdout_log_loss
+
+        trained = LogisticRegression().fit(self.X_train, self.y_train)
+        y_pred_proba = trained.predict_proba(self.X_test)
+        self.assertAlmostEqual(
+            _holdout_log_loss(self.y_train, self.y_test, y_pred_proba),
+            log_loss(y_true=self.y_test, y_pred=y_pred_proba),
+        )
+
+    def test_smac_inline_cv_fold_failure(self):
+        from sklearn.metrics import get_scorer
+
+        from lale.lib.lale.smac import _inline_cv
+
+        scorer = get_scorer("accuracy")
+        X_nan = np.full_like(self.X_train, np.nan)
+        fold_views = [
+            (self.X_train, self.y_train, self.X_test, self.y_test, None),
+            (X_nan, self.y_train, self.X_test, self.y_test, None),
+        ]
+        with self.assertRaises(ValueError):
+            _inline_cv(LogisticRegression(), fold_views, scorer)
+
+        failures = []
+
+        def on_fold_failure(e):
+            failures.append(e)
+            return 0.5, None, 0
+
+        score, _, _, _ = _inline_cv(
+            LogisticRegression(), fold_views, scorer, on_fold_failure
+        )
+        self.assertEqual(len(failures), 1)
+        trained = LogisticRegression().fit(self.X_train, self.y_train)
+        good_score = scorer(trained, self.X_test, self.y_test)
+        self.assertAlmostEqual(score, (good_score + 0.5) / 2)
+
+    def test_smac_inline_cv_pruned(self):
+        from unittest import mock
+
+        from sklearn.metrics import get_scorer
+
+        import lale.lib.lale.smac
+
+        fold_view = (self.X_train, self.y_train, self.X_test, self.y_test, None)
+        with mock.patch.object(
+            lale.lib.lale.smac,
+            "_fit_and_score",
+            wraps=lale.lib.lale.smac._fit_and_score,
+        ) as fit_and_score:
+            _, _, _, pruned = lale.lib.lale.smac._inline_cv(
+                LogisticRegression(),
+                [fold_view] * 5,
+                get_scorer("accuracy"),
+                incumbent_score=2.0,
+            )
+        # no accuracy can reach the incumbent, so the trial stops as soon
+        # as there are two scores for a confidence bound
+        self.assertTrue(pruned)
+        self.assertEqual(fit_and_score.call_count, 2)
+
 
 def run_hyperopt_on_planned_pipeline(planned_pipeline, max_iters=1):
     # data
@@ -860,6 +1211,26 @@ class TestCrossValidation(unittest.TestCase):
             )
         self.assertEqual(len(cv_results), 2)
 
+    def test_cv_track_trials_parallel(self):
+        trainable_lr = LogisticRegression(n_jobs=1)
+        iris = sklearn.datasets.load_iris()
+        from sklearn.model_selection import KFold
+
+        from lale.helpers import cross_val_score_track_trials
+
+        sequential_score, _, _ = cross_val_score_track_trials(
+            trainable_lr, iris.data, iris.target, scoring="accuracy", cv=KFold(3)
+        )
+        parallel_score, _, _ = cross_val_score_track_trials(
+            trainable_lr,
+            iris.data,
+            iris.target,
+            scoring="accuracy",
+            cv=KFold(3),
+            n_jobs=2,
+        )
+        self.assertAlmostEqual(sequential_score, parallel_score)
+
 
 class TestHigherOrderOperators(unittest.TestCase):
     def setUp(self):